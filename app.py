@@ -1,5 +1,5 @@
-
 import io
+
 import streamlit as st
 from processor import build_processed_workbook_c6, build_processed_workbook_nubank_auto
 
@@ -41,14 +41,18 @@ if uploaded is not None:
     st.write("Arquivo recebido:", uploaded.name)
     if st.button("▶️ Processar", type="primary"):
         try:
+            # O UploadedFile já é um stream: é repassado direto, sem cópia via .read().
+            # Só a entrada ficou mais leve: st.download_button exige bytes/BytesIO e guarda a sua própria cópia,
+            # então a saída vai direto para um BytesIO (spool em disco aqui não reduziria o pico de memória).
+            output = io.BytesIO()
             if bank.startswith("C6"):
-                output_bytes = build_processed_workbook_c6(uploaded.read())
+                build_processed_workbook_c6(uploaded, output)
             else:
-                output_bytes = build_processed_workbook_nubank_auto(uploaded.name, uploaded.read())
+                build_processed_workbook_nubank_auto(uploaded.name, uploaded, output)
             st.success("Processamento concluído!")
             st.download_button(
                 label="⬇️ Baixar planilha processada",
-                data=output_bytes,
+                data=output,
                 file_name="fatura_processada.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )
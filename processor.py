@@ -1,5 +1,6 @@
 
-import io, re, unicodedata
+import io, os, re, tempfile, unicodedata
+from contextlib import contextmanager
 import pandas as pd
 import matplotlib.pyplot as plt
 from openpyxl import Workbook
@@ -8,6 +9,27 @@ from openpyxl.drawing.image import Image as XLImage
 from PIL import Image as PILImage
 import pdfplumber
 
+# Saída acima deste tamanho vai para disco em vez de ficar em memória.
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+@contextmanager
+def _open_source(src):
+    """
+    Yield a seekable binary stream for `src`:
+    - bytes/bytearray -> wrapped in BytesIO (kept for compatibility);
+    - str / os.PathLike -> opened from disk and closed on exit;
+    - file-like objects (e.g. Streamlit's UploadedFile) -> rewound and used as is, without copying.
+    """
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(src); return
+    if isinstance(src, (str, os.PathLike)):
+        with open(src, "rb") as fh: yield fh
+        return
+    src.seek(0); yield src
+
+def _new_output():
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+b")
+
 def _sanitize_parcela_c6(val):
     """
     Sanitize 'Parcela' for C6:
@@ -126,21 +148,23 @@ def _add_index_and_order(wb, cards_display):
     wb._sheets = [wb[s] for s in ordered]
 
 # --------- C6 (Excel) ---------
-def _pick_sheet_and_dataframe_c6(file_bytes):
-    bio = io.BytesIO(file_bytes)
-    try:
-        df = pd.read_excel(bio, sheet_name="Transações Originais", header=0)
-        if df is not None and not df.empty: return df
-    except Exception: pass
-    bio.seek(0); xl = pd.ExcelFile(bio); best_sheet = xl.sheet_names[0]; best_score = -1
-    for sh in xl.sheet_names:
-        try: df5 = xl.parse(sh, header=0, nrows=5)
-        except Exception: continue
-        norm_cols = [_normalize_header(c) for c in df5.columns]; score = 0
-        for tokens in [{"nome","cartao"},{"final","cartao"},{"categoria"},{"descricao"},{"valor"}]:
-            if any(all(tok in h for tok in tokens) for h in norm_cols): score += 1
-        if score > best_score: best_score = score; best_sheet = sh
-    bio.seek(0); df = pd.read_excel(bio, sheet_name=best_sheet, header=0)
+def _pick_sheet_and_dataframe_c6(src):
+    with _open_source(src) as bio:
+        xl = pd.ExcelFile(bio)
+        if "Transações Originais" in xl.sheet_names:
+            try:
+                df = xl.parse("Transações Originais", header=0)
+                if df is not None and not df.empty: return df
+            except Exception: pass
+        best_sheet = xl.sheet_names[0]; best_score = -1
+        for sh in xl.sheet_names:
+            try: df5 = xl.parse(sh, header=0, nrows=5)
+            except Exception: continue
+            norm_cols = [_normalize_header(c) for c in df5.columns]; score = 0
+            for tokens in [{"nome","cartao"},{"final","cartao"},{"categoria"},{"descricao"},{"valor"}]:
+                if any(all(tok in h for tok in tokens) for h in norm_cols): score += 1
+            if score > best_score: best_score = score; best_sheet = sh
+        df = xl.parse(best_sheet, header=0)
     first_rows = min(8, len(df))
     for r in range(first_rows):
         row_vals = df.iloc[r].tolist(); norm = [_normalize_header(v) for v in row_vals]
@@ -151,8 +175,8 @@ def _pick_sheet_and_dataframe_c6(file_bytes):
             new_cols = [str(v) for v in row_vals]; df = df.iloc[r+1:].reset_index(drop=True); df.columns = new_cols; break
     return df
 
-def build_processed_workbook_c6(file_bytes: bytes) -> bytes:
-    df = _pick_sheet_and_dataframe_c6(file_bytes)
+def build_processed_workbook_c6(src, out=None):
+    df = _pick_sheet_and_dataframe_c6(src)
     norm_map = {_normalize_header(c): c for c in df.columns}
     def find_col(*tokens_sets):
         for norm, orig in norm_map.items():
@@ -215,7 +239,7 @@ def build_processed_workbook_c6(file_bytes: bytes) -> bytes:
             return None
         df["Parcela"] = df["Parcela"].apply(_norm_parcela_c6)
     # --- fim normalização C6 ---
-    return _build_excel_from_transactions(df)
+    return _build_excel_from_transactions(df, out)
 
 # --------- Nubank (PDF) ---------
 def _clean_person_name_candidate(s):
@@ -250,9 +274,9 @@ def _guess_holder_from_header(full_text):
         if cand: return cand
     return "Nubank"
 
-def _extract_holder_candidates_from_pages(file_bytes: bytes):
-    bio = io.BytesIO(file_bytes); cands = []
-    with pdfplumber.open(bio) as pdf:
+def _extract_holder_candidates_from_pages(src):
+    cands = []
+    with _open_source(src) as bio, pdfplumber.open(bio) as pdf:
         for page in pdf.pages:
             txt = page.extract_text() or ""
             lines = [l.strip() for l in txt.splitlines()[:12] if l and l.strip()]
@@ -349,12 +373,12 @@ def _enrich_parcelamento_columns(df):
             except Exception: term_list.append(None)
     df['Término Estimado'] = term_list; return df
 
-def _parse_nubank_pdf(file_bytes: bytes) -> pd.DataFrame:
-    bio = io.BytesIO(file_bytes); texts = []
-    with pdfplumber.open(bio) as pdf:
+def _parse_nubank_pdf(src) -> pd.DataFrame:
+    texts = []
+    with _open_source(src) as bio, pdfplumber.open(bio) as pdf:
         for page in pdf.pages: texts.append(page.extract_text() or "")
     full = "\n".join(texts)
-    cands = _extract_holder_candidates_from_pages(file_bytes)
+    cands = _extract_holder_candidates_from_pages(src)
     if cands:
         from collections import Counter; holder = Counter(cands).most_common(1)[0][0]
     else:
@@ -381,8 +405,7 @@ def _parse_nubank_pdf(file_bytes: bytes) -> pd.DataFrame:
         rows.append({"Data": dt,"Nome no Cartão": holder,"Final do Cartão": last4,"Categoria": _categorize(desc_clean),"Descrição": desc_clean,"Parcela": parcela,"Valor BRL": valor})
     df = pd.DataFrame(rows)
     if df.empty:
-        bio.seek(0)
-        with pdfplumber.open(bio) as pdf:
+        with _open_source(src) as bio, pdfplumber.open(bio) as pdf:
             for page in pdf.pages:
                 tbl = page.extract_table()
                 if not tbl: continue
@@ -403,19 +426,19 @@ def _parse_nubank_pdf(file_bytes: bytes) -> pd.DataFrame:
     if "Valor BRL" in df.columns: df["Valor BRL"] = pd.to_numeric(df["Valor BRL"], errors="coerce")
     df = _enrich_parcelamento_columns(df); return df
 
-def build_processed_workbook_nubank(file_bytes: bytes) -> bytes:
-    df = _parse_nubank_pdf(file_bytes)
-    return _build_excel_from_transactions(df)
+def build_processed_workbook_nubank(src, out=None):
+    df = _parse_nubank_pdf(src)
+    return _build_excel_from_transactions(df, out)
 
 # --------- Workbook builder ---------
 
-def _parse_nubank_csv(file_bytes: bytes) -> pd.DataFrame:
-    bio = io.BytesIO(file_bytes)
-    try:
-        df = pd.read_csv(bio, sep=",")
-    except Exception:
-        bio.seek(0)
-        df = pd.read_csv(bio, sep=";")
+def _parse_nubank_csv(src) -> pd.DataFrame:
+    with _open_source(src) as bio:
+        try:
+            df = pd.read_csv(bio, sep=",")
+        except Exception:
+            bio.seek(0)
+            df = pd.read_csv(bio, sep=";")
     # expected columns: date, title, amount
     cols = {c.lower(): c for c in df.columns}
     col_date = cols.get("date") or cols.get("data") or list(df.columns)[0]
@@ -436,16 +459,21 @@ def _parse_nubank_csv(file_bytes: bytes) -> pd.DataFrame:
     out = _enrich_parcelamento_columns(out)
     return out
 
-def build_processed_workbook_nubank_auto(file_name: str, file_bytes: bytes) -> bytes:
+def build_processed_workbook_nubank_auto(file_name: str, src, out=None):
     name = (file_name or "").lower()
     if name.endswith(".csv"):
-        df = _parse_nubank_csv(file_bytes)
+        df = _parse_nubank_csv(src)
     elif name.endswith(".pdf"):
-        df = _parse_nubank_pdf(file_bytes)
+        df = _parse_nubank_pdf(src)
     else:
         raise ValueError("Formato Nubank não suportado: use .csv ou .pdf")
-    return _build_excel_from_transactions(df)
-def _build_excel_from_transactions(df: pd.DataFrame) -> bytes:
+    return _build_excel_from_transactions(df, out)
+def _build_excel_from_transactions(df: pd.DataFrame, out=None):
+    """
+    Build the consolidated workbook and save it into `out` (any writable binary file-like object).
+    When `out` is None a SpooledTemporaryFile is used: it stays in memory up to SPOOL_MAX_BYTES and
+    spills to disk beyond that. Returns the stream rewound to position 0; the caller owns and closes it.
+    """
     df_pos = df[df["Valor BRL"] > 0].copy(); df_neg = df[df["Valor BRL"] < 0].copy()
     consol_cartao = (df_pos.groupby(["Final do Cartão","Nome no Cartão","Descrição"], as_index=False)["Valor BRL"].sum().sort_values(["Final do Cartão","Valor BRL"], ascending=[True, False]).rename(columns={"Nome no Cartão":"Nome do Portador"}))
     consol_estab = (df_pos.groupby(["Nome no Cartão","Final do Cartão","Descrição"], as_index=False)["Valor BRL"].sum().sort_values(["Nome no Cartão","Final do Cartão","Valor BRL"], ascending=[True, True, False]).rename(columns={"Nome no Cartão":"Nome do Portador"}))
@@ -530,4 +558,5 @@ def _build_excel_from_transactions(df: pd.DataFrame) -> bytes:
 
     _add_index_and_order(wb, cards_display)
 
-    out_io = io.BytesIO(); wb.save(out_io); out_io.seek(0); return out_io.getvalue()
+    if out is None: out = _new_output()
+    wb.save(out); out.seek(0); return out